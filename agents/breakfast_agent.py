@@ -1,5 +1,8 @@
 from autogen import AssistantAgent
 from config import groq_config
+from tools.prompt_builder import build_meal_prompt, compact_system_message
+from tools.meal_validator import apply_price_estimates, meal_calorie_limit, select_options
+from tools.circuit_breaker import CircuitOpenError, llm_circuit_breaker
 import json
 import re
 
@@ -7,7 +10,7 @@ class BreakfastAgent(AssistantAgent):
     def __init__(self):
         super().__init__(
             name="BreakfastAgent",
-            system_message=f"""
+            system_message=compact_system_message(f"""
                 You are a breakfast specialist AI. Your responsibilities:
                 1. Suggest a set number of breakfast options matching the user's dietary needs.
                 2. Ensure meals take a reasonable preparation time.
@@ -31,7 +34,7 @@ class BreakfastAgent(AssistantAgent):
                         "message": "string (budget feedback)"
                     }}
                 }}
-            """, 
+            """), 
             llm_config={
                 **groq_config.llm_config,
                 "temperature": 0.7,
@@ -40,7 +43,8 @@ class BreakfastAgent(AssistantAgent):
             }
         )
     
-    def generate_suggestions(self, user_input, budget_agent):
+    def generate_suggestions(self, user_input, budget_agent, meal_budget=None):
+        """meal_budget overrides the default quarter of the remaining budget"""
         max_retries = 3
         attempts = 0
         dietary = user_input.get("dietary", "").lower()
@@ -58,34 +62,34 @@ class BreakfastAgent(AssistantAgent):
             "french toast", "pasta", "flour", "barley", "rye", "crackers", "cookies", "cake"
         ]
         }.get(dietary, [])
+        candidate_count = max(3, groq_config.MEAL_CANDIDATES)
         while attempts < max_retries:
             try:
                 num_meal_types = 4
-                max_meal_budget = budget_agent.remaining_budget / num_meal_types
-                max_meal_calories = user_input.get("calorie_goal", 2000) / num_meal_types
+                max_meal_budget = meal_budget if meal_budget is not None else budget_agent.remaining_budget / num_meal_types
+                max_meal_calories = meal_calorie_limit(user_input)
                 
                 messages = [{
                     "role": "user",
-                    "content": f"""Create exactly 3 breakfast options that:
-                    - Strictly follow {dietary} dietary restrictions
-                    - Have combined cost ≤ ${max_meal_budget:.2f}
-                    - Total calories ≤ {max_meal_calories:.0f}kcal
-                    - No single meal exceeds ${max_meal_budget/3:.2f}
-                    - Use diverse ingredients and cooking methods
-                    - Include both hot and cold options
-                    - Use diverse protein sources
-                    - Use labeled gluten-free or plant-based ingredients where necessary
-                    - If constraints conflict, prioritize diet restrictions over cost
-                    - Format response as:"""
-                    + self.system_message.split("Required format:")[1]
+                    "content": build_meal_prompt(
+                        self, "breakfast", dietary, max_meal_budget, max_meal_calories,
+                        count=candidate_count
+                    )
                 }]
 
-                response = self.generate_reply(messages)
+                response = llm_circuit_breaker.call(self.generate_reply, messages)
                 json_match = re.search(r'\{.*\}', response, re.DOTALL)
                 if not json_match:
                     return {"error": "No valid JSON found"}
                 
                 meal_data = json.loads(json_match.group(0))
+                apply_price_estimates(meal_data.get("options", []))
+
+                # Over-generated batches keep only the first 3 valid candidates
+                if candidate_count > 3:
+                    meal_data["options"] = select_options(
+                        meal_data.get("options", []), forbidden, max_meal_budget, max_meal_calories
+                    )
 
                 if "options" not in meal_data or len(meal_data["options"]) != 3:
                         raise ValueError("Invalid meal options format")
@@ -117,6 +121,8 @@ class BreakfastAgent(AssistantAgent):
                             "error": f"Failed after {max_retries} attempts: {str(e)}",
                             "suggestion": "Try relaxing constraints or increasing budget"
                         }
+            except CircuitOpenError as e:
+                return {"error": str(e), "circuit_open": True}
             except Exception as e:
                 return {"error": f"Unexpected error: {str(e)}"}
 
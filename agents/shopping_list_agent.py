@@ -1,9 +1,13 @@
-from typing import Dict, List
+from typing import Dict, Iterator, List
+import csv
+import html
+import io
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from groq import Groq
 import os
 from dotenv import load_dotenv
+from tools.price_table import lookup_price
 
 load_dotenv()
 
@@ -17,7 +21,7 @@ class Ingredient:
 
 class ShoppingListAgent:
     def __init__(self):
-        self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        self._client = None
         self.store_categories = {
             "produce": ["vegetables", "fruits", "herbs"],
             "dairy": ["milk", "cheese", "yogurt", "butter"],
@@ -29,6 +33,13 @@ class ShoppingListAgent:
             "other": []
         }
 
+    @property
+    def client(self) -> Groq:
+        """Groq client, created on first use so CPU-only list building needs no API key."""
+        if self._client is None:
+            self._client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        return self._client
+
     def process_meal_plans(self, meal_plans: Dict[str, Dict]) -> List[Ingredient]:
         """Process meal plans and extract ingredients."""
         all_ingredients = []
@@ -43,7 +54,7 @@ class ShoppingListAgent:
                                 "name": ingredient,
                                 "quantity": 1.0,  # Default quantity
                                 "unit": "piece",  # Default unit
-                                "estimated_price": 0.0  # Will be updated if available
+                                "estimated_price": 0.0  # Filled from the price table
                             }
                             all_ingredients.append(self._parse_ingredient(ingredient_data))
         
@@ -51,12 +62,17 @@ class ShoppingListAgent:
 
     def _parse_ingredient(self, ingredient: Dict) -> Ingredient:
         """Parse ingredient data into Ingredient object."""
+        name = ingredient.get("name", "")
+        quantity = float(ingredient.get("quantity", 0))
+        estimated_price = float(ingredient.get("estimated_price", 0))
+        if not estimated_price:
+            estimated_price = lookup_price(name) * quantity
         return Ingredient(
-            name=ingredient.get("name", ""),
-            quantity=float(ingredient.get("quantity", 0)),
+            name=name,
+            quantity=quantity,
             unit=ingredient.get("unit", ""),
-            category=self._categorize_ingredient(ingredient.get("name", "")),
-            estimated_price=float(ingredient.get("estimated_price", 0))
+            category=self._categorize_ingredient(name),
+            estimated_price=estimated_price
         )
 
     def _categorize_ingredient(self, ingredient_name: str) -> str:
@@ -103,30 +119,157 @@ class ShoppingListAgent:
             "total_estimated_cost": total_estimated_cost
         }
 
+    def update_shopping_list(self, shopping_list: Dict, old_meal: Dict, new_meal: Dict) -> Dict:
+        """Swap one meal's ingredients in an existing shopping list without reprocessing the whole plan."""
+        items = {}
+        for category_items in shopping_list["categorized_list"].values():
+            for item in category_items:
+                items[(item.name.lower(), item.unit)] = replace(item)
+
+        for ingredient in self.process_meal_plans({"old": old_meal}):
+            key = (ingredient.name.lower(), ingredient.unit)
+            if key in items:
+                items[key].quantity -= ingredient.quantity
+                items[key].estimated_price -= ingredient.estimated_price
+                if items[key].quantity <= 0:
+                    del items[key]
+
+        for ingredient in self.process_meal_plans({"new": new_meal}):
+            key = (ingredient.name.lower(), ingredient.unit)
+            if key in items:
+                items[key].quantity += ingredient.quantity
+                items[key].estimated_price += ingredient.estimated_price
+            else:
+                items[key] = ingredient
+
+        categorized_list = {}
+        for item in items.values():
+            categorized_list.setdefault(item.category, []).append(item)
+
+        return {
+            "categorized_list": {
+                category: categorized_list[category]
+                for category in self.store_categories.keys()
+                if category in categorized_list
+            },
+            "total_items": len(items),
+            "total_estimated_cost": sum(i.estimated_price for i in items.values())
+        }
+
+    EXPORT_FORMATS = {
+        "text": "text/plain",
+        "json": "application/json",
+        "csv": "text/csv",
+        "html": "text/html"
+    }
+
     def export_shopping_list(self, shopping_list: Dict, format: str = "text") -> str:
         """Export shopping list in specified format."""
-        if format == "text":
-            return self._format_text_list(shopping_list)
-        elif format == "json":
-            return json.dumps(shopping_list, indent=2)
-        else:
+        return "".join(self.iter_export(shopping_list, format))
+
+    def iter_export(self, shopping_list: Dict, format: str = "text") -> Iterator[str]:
+        """Yield the exported shopping list in chunks, one item at a time."""
+        exporters = {
+            "text": self._iter_text_list,
+            "json": self._iter_json_list,
+            "csv": self._iter_csv_list,
+            "html": self._iter_html_list
+        }
+        if format not in exporters:
             raise ValueError(f"Unsupported format: {format}")
+        return exporters[format](shopping_list)
 
-    def _format_text_list(self, shopping_list: Dict) -> str:
-        """Format shopping list as text."""
-        output = []
-        output.append("Shopping List\n")
-        output.append("=" * 50 + "\n")
-        
+    @staticmethod
+    def _ingredient_record(item) -> Dict:
+        """Plain dict for an Ingredient (or an already-serialized item) without asdict's deep copy."""
+        if isinstance(item, dict):
+            return item
+        return {
+            "name": item.name,
+            "quantity": item.quantity,
+            "unit": item.unit,
+            "category": item.category,
+            "estimated_price": item.estimated_price
+        }
+
+    def _iter_items(self, shopping_list: Dict) -> Iterator[tuple]:
+        """Yield (category, item record) pairs for non-empty categories."""
         for category, items in shopping_list["categorized_list"].items():
-            if items:
-                output.append(f"\n{category.upper()}")
-                output.append("-" * len(category))
-                for item in items:
-                    output.append(f"- {item.name}: {item.quantity} {item.unit}")
-        
-        output.append("\n" + "=" * 50)
-        output.append(f"Total Items: {shopping_list['total_items']}")
-        output.append(f"Estimated Total Cost: ${shopping_list['total_estimated_cost']:.2f}")
-        
-        return "\n".join(output) 
\ No newline at end of file
+            for item in items:
+                yield category, self._ingredient_record(item)
+
+    def _iter_text_list(self, shopping_list: Dict) -> Iterator[str]:
+        """Stream shopping list as text."""
+        yield "Shopping List\n\n"
+        yield "=" * 50 + "\n\n"
+
+        current_category = None
+        for category, item in self._iter_items(shopping_list):
+            if category != current_category:
+                current_category = category
+                yield f"\n{category.upper()}\n"
+                yield "-" * len(category) + "\n"
+            yield f"- {item['name']}: {item['quantity']} {item['unit']}\n"
+
+        yield "\n" + "=" * 50 + "\n"
+        yield f"Total Items: {shopping_list['total_items']}\n"
+        yield f"Estimated Total Cost: ${shopping_list['total_estimated_cost']:.2f}"
+
+    def _iter_json_list(self, shopping_list: Dict) -> Iterator[str]:
+        """Stream shopping list as JSON, serializing one item at a time."""
+        yield '{"categorized_list": {'
+        current_category = None
+        for category, item in self._iter_items(shopping_list):
+            if category != current_category:
+                prefix = "], " if current_category is not None else ""
+                yield f"{prefix}{json.dumps(category)}: ["
+                current_category = category
+            else:
+                yield ", "
+            yield json.dumps(item)
+        if current_category is not None:
+            yield "]"
+        yield (
+            f'}}, "total_items": {json.dumps(shopping_list["total_items"])}, '
+            f'"total_estimated_cost": {json.dumps(shopping_list["total_estimated_cost"])}}}'
+        )
+
+    def _iter_csv_list(self, shopping_list: Dict) -> Iterator[str]:
+        """Stream shopping list as CSV rows."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def row(values):
+            writer.writerow(values)
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return chunk
+
+        yield row(["category", "name", "quantity", "unit", "estimated_price"])
+        for category, item in self._iter_items(shopping_list):
+            yield row([category, item["name"], item["quantity"], item["unit"], f"{item['estimated_price']:.2f}"])
+
+    def _iter_html_list(self, shopping_list: Dict) -> Iterator[str]:
+        """Stream shopping list as a standalone printable HTML page."""
+        yield (
+            "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"UTF-8\">\n"
+            "<title>Shopping List</title>\n"
+            "<style>body{font-family:sans-serif;margin:2em}h2{border-bottom:1px solid #ccc}"
+            "li{list-style:none}li::before{content:\"\\2610  \"}</style>\n"
+            "</head>\n<body onload=\"window.print()\">\n<h1>Shopping List</h1>\n"
+        )
+        current_category = None
+        for category, item in self._iter_items(shopping_list):
+            if category != current_category:
+                if current_category is not None:
+                    yield "</ul>\n"
+                yield f"<h2>{html.escape(category.title())}</h2>\n<ul>\n"
+                current_category = category
+            yield f"<li>{html.escape(item['name'])}: {item['quantity']} {html.escape(item['unit'])}</li>\n"
+        if current_category is not None:
+            yield "</ul>\n"
+        yield (
+            f"<p>Total Items: {shopping_list['total_items']}<br>"
+            f"Estimated Total Cost: ${shopping_list['total_estimated_cost']:.2f}</p>\n</body>\n</html>\n"
+        )
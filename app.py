@@ -1,18 +1,53 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 from agents.breakfast_agent import BreakfastAgent
 from agents.lunch_agent import LunchAgent
 from agents.dinner_agent import DinnerAgent
 from agents.snack_agent import SnackAgent
 from agents.budget_agent import BudgetAgent
 from agents.shopping_list_agent import ShoppingListAgent
+from tools.prompt_builder import get_prompt_token_stats
+from tools.fragment_cache import FragmentCache, content_hash
+from markupsafe import Markup
+from tools.plan_store import InMemoryPlanStore, SQLitePlanStore
+from tools.plan_cache import ProfilePlanCache, SQLiteProfilePlanCache
+from tools.circuit_breaker import llm_circuit_breaker
+from tools.recipe_fallback import fallback_meal
+from tools.meal_validator import meal_calorie_limit
+from tools.job_queue import FINISHED_STATUSES, InMemoryJobBackend, JobManager, QueueFullError, SQLiteJobBackend
+from tools.api_encoding import compact_meal_plan, compact_shopping_list, compress_body, shopping_list_from_dict, shopping_list_to_dict
 from dotenv import load_dotenv
 import os
 import autogen
+import hashlib
+import math
 import json
 
 load_dotenv()
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Required for session
+# Required for session; set SECRET_KEY so sessions survive restarts and work across workers
+app.secret_key = os.getenv("SECRET_KEY") or os.urandom(24)
+# Directory for SQLite files shared between worker processes
+state_dir = os.getenv("STATE_DIR", ".")
+
+# Compile page and fragment templates once at startup
+for template_name in ('index.html', 'shopping_list.html', '_meal_section.html', '_shopping_category.html'):
+    app.jinja_env.get_template(template_name)
+fragment_cache = FragmentCache(max_entries=int(os.getenv("FRAGMENT_CACHE_SIZE", 512)))
+if os.getenv("PLAN_STORE", "memory") == "sqlite":
+    plan_store = SQLitePlanStore(os.path.join(state_dir, "plans.db"), max_plans=int(os.getenv("PLAN_STORE_SIZE", 1000)))
+else:
+    plan_store = InMemoryPlanStore(max_plans=int(os.getenv("PLAN_STORE_SIZE", 1000)))
+
+# Shown when the session's plan was evicted from plan_store or lost on restart
+PLAN_EXPIRED_ERROR = "No meal plan found. It may have expired; please create a new plan."
+
+# Near-duplicate plan reuse; PLAN_CACHE_BANDS overrides band widths per diet as JSON
+plan_cache_bands = json.loads(os.getenv("PLAN_CACHE_BANDS", "{}"))
+if os.getenv("PLAN_CACHE_STORE", "memory") == "sqlite":
+    plan_cache = SQLiteProfilePlanCache(os.path.join(state_dir, "plan_cache.db"), bands=plan_cache_bands)
+else:
+    plan_cache = ProfilePlanCache(bands=plan_cache_bands)
+plan_cache_enabled = os.getenv("PLAN_CACHE_ENABLED", "1") == "1"
 
 # Groq configuration
 config_list = [
@@ -22,10 +57,171 @@ config_list = [
         "api_key": os.getenv("GROQ_API_KEY"),
         "temperature": 0.3,
         "max_tokens": 1024,
-        "timeout": 120
+        "timeout": int(os.getenv("LLM_TIMEOUT", 120))
     }
 ]
 
+def render_fragment(template_name, **context):
+    """Render a template fragment as markup that pages can embed unescaped"""
+    return Markup(render_template(template_name, **context))
+
+def render_meal_sections(meal_plan: dict) -> dict:
+    """Meal-card sections keyed by meal type, served from the fragment cache"""
+    return {
+        meal_type: fragment_cache.get_or_render(
+            ('meal', meal_type, content_hash(meal_data)),
+            render_fragment, '_meal_section.html', meal_type=meal_type, meal_data=meal_data
+        )
+        for meal_type, meal_data in meal_plan.items()
+        if meal_type != 'remaining_budget'
+    }
+
+def render_category_sections(record: dict) -> list:
+    """Shopping-list category cards for a stored plan, cached per plan version"""
+    version = (record["id"], record["updated_at"])
+    return [
+        fragment_cache.get_or_render(
+            ('category', version, category),
+            render_fragment, '_shopping_category.html', category=category, items=items
+        )
+        for category, items in record["shopping_list"]["categorized_list"].items()
+        if items
+    ]
+
+def parse_user_data(source) -> dict:
+    """Read planner inputs from a form or JSON body"""
+    # None covers malformed JSON and a missing application/json Content-Type
+    if not hasattr(source, 'get'):
+        raise TypeError("request body must be a JSON object sent as application/json")
+    budget = float(source.get('budget', 30.0))
+    calories = float(source.get('calories', 2000))
+    # Rejects nan/inf too; plan cache bands and agent limits divide these values
+    if not math.isfinite(budget) or budget <= 0:
+        raise ValueError("budget must be a positive number")
+    if not math.isfinite(calories) or calories < 1:
+        raise ValueError("calories must be a positive number")
+    return {
+        "dietary": source.get('dietary', 'none'),
+        "budget": budget,
+        "calories": int(calories),
+        "time": source.get('time', '30 mins')
+    }
+
+def create_plan(user_data: dict) -> tuple:
+    """Run the agents, build the shopping list and store the plan"""
+    agents = initialize_agents(user_data["budget"])
+    meal_plan = plan_cache.lookup(user_data, agents["budget"]) if plan_cache_enabled else None
+    if meal_plan is None:
+        meal_plan = run_meal_planning(agents, user_data)
+        if plan_cache_enabled:
+            plan_cache.store(user_data, meal_plan)
+    shopping_list = agents["shopping"].generate_shopping_list(meal_plan)
+    plan_id = plan_store.save({
+        "user_data": user_data,
+        "meal_plan": meal_plan,
+        "shopping_list": shopping_list_to_dict(shopping_list)
+    })
+    return plan_id, meal_plan, shopping_list
+
+MEAL_AGENTS = {
+    "breakfast": BreakfastAgent,
+    "lunch": LunchAgent,
+    "dinner": DinnerAgent,
+    "snacks": SnackAgent
+}
+
+def replan_meal(plan_id: str, meal_type: str) -> tuple:
+    """Regenerate one meal of a stored plan and patch its shopping list.
+
+    The new meal may spend the plan's remaining budget plus whatever the
+    replaced meal cost. Returns (record, error); the stored plan is left
+    untouched when regeneration fails.
+    """
+    record = plan_store.get(plan_id)
+    if record is None:
+        return None, "Plan not found"
+
+    meal_plan = record["meal_plan"]
+    old_meal = meal_plan.get(meal_type, {})
+    available_budget = meal_plan.get("remaining_budget", 0) + old_meal.get("total_cost", 0)
+
+    budget_agent = BudgetAgent(config_list, available_budget)
+    # Only one meal is being planned, so it gets the whole available budget
+    response = MEAL_AGENTS[meal_type]().generate_suggestions(
+        record["user_data"], budget_agent, meal_budget=available_budget
+    )
+    if "error" in response:
+        return None, response["error"]
+    budget_check = budget_agent.validate_meal_cost(response.get("total_cost", 0))
+    if budget_check["status"] != "approved":
+        return None, budget_check["message"]
+
+    shopping_list = ShoppingListAgent().update_shopping_list(
+        shopping_list_from_dict(record["shopping_list"]), old_meal, response
+    )
+    record = {
+        **record,
+        "meal_plan": {**meal_plan, meal_type: response, "remaining_budget": budget_check["remaining_budget"]},
+        "shopping_list": shopping_list_to_dict(shopping_list)
+    }
+    plan_store.update(plan_id, record)
+    return record, None
+
+def json_response(payload, status=200):
+    """Compact JSON response with a weak ETag, conditional GET and compression"""
+    body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()
+    if request.method == 'GET' and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body, encoding = compress_body(body, request.headers.get('Accept-Encoding', ''))
+        response = Response(body, status=status, mimetype='application/json')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept-Encoding')
+    return response
+
+def wants_compact() -> bool:
+    """Clients opt into the compact encoding with ?format=compact"""
+    return request.args.get('format') == 'compact'
+
+def run_plan_job(payload: dict) -> dict:
+    """Background job handler: plan, shopping list and storage"""
+    plan_id, _, _ = create_plan(payload)
+    return {"plan_id": plan_id}
+
+def create_job_manager() -> JobManager:
+    """Job manager with the backend selected by JOB_BACKEND (memory or sqlite)"""
+    if os.getenv("JOB_BACKEND", "memory") == "sqlite":
+        backend = SQLiteJobBackend(
+            os.getenv("JOB_DB_PATH", os.path.join(state_dir, "jobs.db")),
+            max_finished=int(os.getenv("JOB_HISTORY_SIZE", 1000))
+        )
+    else:
+        backend = InMemoryJobBackend(max_finished=int(os.getenv("JOB_HISTORY_SIZE", 1000)))
+    return JobManager(
+        backend,
+        run_plan_job,
+        max_workers=int(os.getenv("JOB_WORKERS", 4)),
+        max_pending=int(os.getenv("JOB_MAX_PENDING", 32)),
+        # Default: four meal calls that each use up every LLM timeout and retry
+        stale_after=float(os.getenv(
+            "JOB_STALE_AFTER",
+            4 * int(os.getenv("LLM_TIMEOUT", 120)) * (int(os.getenv("LLM_MAX_RETRIES", 3)) + 1)
+        ))
+    )
+
+def job_status(job: dict) -> dict:
+    """Public view of a job record"""
+    status = {"id": job["id"], "status": job["status"]}
+    if job.get("result"):
+        status["result"] = job["result"]
+        status["plan_url"] = f"/api/v1/plans/{job['result']['plan_id']}"
+    if job.get("error"):
+        status["error"] = job["error"]
+    return status
+
 def initialize_agents(user_budget):
     """Initialize all agents with shared configuration"""
     return {
@@ -41,21 +237,11 @@ def initialize_agents(user_budget):
 def meal_planner():
     if request.method == 'POST':
         try:
-            user_data = {
-                "dietary": request.form.get('dietary', 'none'),
-                "budget": float(request.form.get('budget', 30.0)),
-                "calories": int(request.form.get('calories', 2000)),
-                "time": request.form.get('time', '30 mins')
-            }
-            
-            agents = initialize_agents(user_data["budget"])
-            meal_plan = run_meal_planning(agents, user_data)
-            
-            # Store meal plan in session for shopping list access
-            session['meal_plan'] = json.dumps(meal_plan)
+            user_data = parse_user_data(request.form)
+            plan_id, meal_plan, shopping_list = create_plan(user_data)
             
-            # Generate shopping list
-            shopping_list = agents["shopping"].generate_shopping_list(meal_plan)
+            # Only the id goes in the cookie; the plan itself lives in plan_store
+            session['plan_id'] = plan_id
             
             # Debug print (remove in production)
             print("Meal Plan Data:", meal_plan)
@@ -63,6 +249,7 @@ def meal_planner():
             
             return render_template('index.html', 
                                 result=meal_plan,
+                                meal_sections=render_meal_sections(meal_plan),
                                 shopping_list=shopping_list,
                                 remaining_budget=meal_plan.get('remaining_budget', 0))
 
@@ -74,26 +261,226 @@ def meal_planner():
     # Clear results on GET request
     return render_template('index.html', result=None, error=None)
 
+@app.route('/meals/<meal_type>/regenerate', methods=['POST'])
+def regenerate_meal(meal_type):
+    """Replace one meal of the current plan from the results page"""
+    plan_id = session.get('plan_id')
+    if meal_type not in MEAL_AGENTS or not plan_id:
+        return render_template('index.html', error="No meal plan found")
+
+    record, error = replan_meal(plan_id, meal_type)
+    if error:
+        record = plan_store.get(plan_id)
+        if record is None:
+            return render_template('index.html', error=error)
+        error = f"Could not regenerate {meal_type}: {error}"
+    meal_plan = record["meal_plan"]
+
+    return render_template('index.html',
+                        result=meal_plan,
+                        meal_sections=render_meal_sections(meal_plan),
+                        shopping_list=record["shopping_list"],
+                        remaining_budget=meal_plan.get('remaining_budget', 0),
+                        error=error)
+
 @app.route('/shopping-list', methods=['GET'])
 def view_shopping_list():
     """View the shopping list in a dedicated page"""
     try:
-        # Get the meal plan from session
-        meal_plan_json = session.get('meal_plan')
-        if not meal_plan_json:
-            return render_template('shopping_list.html', error="No meal plan found")
-        
-        meal_plan = json.loads(meal_plan_json)
-        agents = initialize_agents(0)  # Budget not needed for shopping list
-        shopping_list = agents["shopping"].generate_shopping_list(meal_plan)
-        
+        # Stored list already reflects any single-meal regeneration
+        record = plan_store.get(session.get('plan_id', ''))
+        if record is None:
+            return render_template('shopping_list.html', error=PLAN_EXPIRED_ERROR)
         return render_template('shopping_list.html', 
-                             shopping_list=shopping_list)
+                             shopping_list=record["shopping_list"],
+                             category_sections=render_category_sections(record))
     except Exception as e:
         print(f"Error in view_shopping_list: {str(e)}")  # Debug print
         return render_template('shopping_list.html', 
                              error=f"Failed to generate shopping list: {str(e)}")
 
+@app.route('/api/v1/plans', methods=['POST'])
+def api_create_plan():
+    """Create a meal plan from a JSON body"""
+    try:
+        user_data = parse_user_data(request.get_json(silent=True))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid input: {str(e)}"}), 400
+    try:
+        plan_id, meal_plan, _ = create_plan(user_data)
+    except Exception as e:
+        print(f"Error in api_create_plan: {str(e)}")  # Debug print
+        return jsonify({"error": f"Planning failed: {str(e)}"}), 500
+
+    response = json_response({
+        "id": plan_id,
+        "meal_plan": compact_meal_plan(meal_plan) if wants_compact() else meal_plan
+    }, status=201)
+    response.headers['Location'] = f"/api/v1/plans/{plan_id}"
+    return response
+
+@app.route('/api/v1/plans/<plan_id>', methods=['GET'])
+def api_get_plan(plan_id):
+    """Retrieve a stored meal plan"""
+    record = plan_store.get(plan_id)
+    if record is None:
+        return jsonify({"error": "Plan not found"}), 404
+    meal_plan = record["meal_plan"]
+    return json_response({
+        "id": plan_id,
+        "meal_plan": compact_meal_plan(meal_plan) if wants_compact() else meal_plan
+    })
+
+@app.route('/api/v1/plans/<plan_id>/shopping-list', methods=['GET'])
+def api_get_shopping_list(plan_id):
+    """Retrieve the shopping list for a stored meal plan"""
+    record = plan_store.get(plan_id)
+    if record is None:
+        return jsonify({"error": "Plan not found"}), 404
+    shopping_list = record["shopping_list"]
+    if wants_compact():
+        shopping_list = compact_shopping_list(shopping_list, record["meal_plan"])
+    return json_response({"id": plan_id, "shopping_list": shopping_list})
+
+@app.route('/api/v1/plans/<plan_id>/meals/<meal_type>', methods=['POST'])
+def api_replan_meal(plan_id, meal_type):
+    """Regenerate a single meal of a stored plan"""
+    if meal_type not in MEAL_AGENTS:
+        return jsonify({"error": f"Unknown meal type: {meal_type}"}), 404
+    try:
+        record, error = replan_meal(plan_id, meal_type)
+    except Exception as e:
+        print(f"Error in api_replan_meal: {str(e)}")  # Debug print
+        return jsonify({"error": f"Replanning failed: {str(e)}"}), 500
+    if error == "Plan not found":
+        return jsonify({"error": error}), 404
+    if error:
+        return jsonify({"error": error}), 422
+
+    meal_plan = record["meal_plan"]
+    shopping_list = record["shopping_list"]
+    if wants_compact():
+        meal_plan, shopping_list = compact_meal_plan(meal_plan), compact_shopping_list(shopping_list, meal_plan)
+    return json_response({"id": plan_id, "meal_plan": meal_plan, "shopping_list": shopping_list})
+
+@app.route('/api/v1/jobs', methods=['POST'])
+def api_submit_job():
+    """Queue plan generation and return a job ID to poll"""
+    try:
+        user_data = parse_user_data(request.get_json(silent=True))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid input: {str(e)}"}), 400
+    try:
+        job_id = job_manager.submit(user_data)
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+
+    response = jsonify({"id": job_id, "status": "queued", "status_url": f"/api/v1/jobs/{job_id}"})
+    response.status_code = 202
+    response.headers['Location'] = f"/api/v1/jobs/{job_id}"
+    return response
+
+@app.route('/api/v1/jobs/<job_id>', methods=['GET'])
+def api_get_job(job_id):
+    """Job status; ?wait=N long-polls up to N seconds (max 30) for completion"""
+    try:
+        wait = min(float(request.args.get('wait', 0) or 0), 30.0)
+    except ValueError:
+        return jsonify({"error": "Invalid input: wait must be a number of seconds"}), 400
+    job = job_manager.wait(job_id, wait) if wait > 0 else job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/v1/jobs/<job_id>/events', methods=['GET'])
+def api_job_events(job_id):
+    """Server-sent events with each job status change until it finishes"""
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def events():
+        last_status = None
+        job = job_manager.get(job_id)
+        while True:
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield f"data: {json.dumps(job_status(job))}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job["status"] in FINISHED_STATUSES:
+                return
+            job = job_manager.wait(job_id, 15, last_status=last_status)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus-style gauges for the LLM circuit breaker and caches
+
+    Every value is local to the serving process; the pid label tells
+    gunicorn workers apart, so scrape each worker or sum across pids.
+    """
+    worker = f'pid="{os.getpid()}"'
+    breaker = llm_circuit_breaker.metrics()
+    lines = [
+        "# HELP llm_circuit_state LLM circuit breaker state (0=closed, 1=half_open, 2=open)",
+        "# TYPE llm_circuit_state gauge",
+        f"llm_circuit_state{{{worker}}} {breaker['state_value']}",
+        f"llm_circuit_window_error_rate{{{worker}}} {breaker['window_error_rate']}",
+        f"llm_calls_total{{{worker}}} {breaker['total_calls']}",
+        f"llm_failures_total{{{worker}}} {breaker['total_failures']}",
+        f"llm_rejected_total{{{worker}}} {breaker['total_rejected']}",
+        f"llm_last_latency_seconds{{{worker}}} {breaker['last_latency_seconds']}",
+    ]
+    lines += [
+        "# HELP llm_prompt_tokens_total Estimated prompt tokens sent, per agent",
+        "# TYPE llm_prompt_tokens_total counter",
+    ]
+    for agent_name, stats in get_prompt_token_stats().items():
+        labels = f'{worker},agent="{agent_name}"'
+        lines += [
+            f'llm_prompt_tokens_total{{{labels}}} {stats["prompt_tokens"]}',
+            f'llm_prompt_calls_total{{{labels}}} {stats["calls"]}',
+            f'llm_prompt_tokens_avg{{{labels}}} {stats["avg_prompt_tokens"]}',
+        ]
+    lines += [
+        f"plan_cache_hits_total{{{worker}}} {plan_cache.hits}",
+        f"plan_cache_misses_total{{{worker}}} {plan_cache.misses}",
+        f"fragment_cache_hits_total{{{worker}}} {fragment_cache.hits}",
+        f"fragment_cache_misses_total{{{worker}}} {fragment_cache.misses}",
+    ]
+    return Response("\n".join(lines) + "\n", mimetype='text/plain')
+
+def export_response(shopping_list: dict, export_format: str):
+    """Stream a shopping list export as a downloadable file"""
+    if export_format not in ShoppingListAgent.EXPORT_FORMATS:
+        return jsonify({"error": f"Unsupported format: {export_format}"}), 400
+    chunks = ShoppingListAgent().iter_export(shopping_list, export_format)
+    response = Response(stream_with_context(chunks), mimetype=ShoppingListAgent.EXPORT_FORMATS[export_format])
+    if export_format != 'html':
+        extension = 'txt' if export_format == 'text' else export_format
+        response.headers['Content-Disposition'] = f'attachment; filename="shopping_list.{extension}"'
+    return response
+
+@app.route('/shopping-list/export', methods=['GET'])
+def export_shopping_list():
+    """Download the current plan's shopping list (?format=text|json|csv|html)"""
+    record = plan_store.get(session.get('plan_id', ''))
+    if record is None:
+        return render_template('shopping_list.html', error=PLAN_EXPIRED_ERROR)
+    return export_response(record["shopping_list"], request.args.get('format', 'text'))
+
+@app.route('/api/v1/plans/<plan_id>/shopping-list/export', methods=['GET'])
+def api_export_shopping_list(plan_id):
+    """Streamed shopping list export for a stored plan"""
+    record = plan_store.get(plan_id)
+    if record is None:
+        return jsonify({"error": "Plan not found"}), 404
+    return export_response(record["shopping_list"], request.args.get('format', 'json'))
+
 def run_meal_planning(agents: dict, user_data: dict) -> dict:
     """Orchestrate meal planning workflow"""
     meal_plan = {}
@@ -103,6 +490,14 @@ def run_meal_planning(agents: dict, user_data: dict) -> dict:
     for meal_type in ["breakfast", "lunch", "dinner", "snacks"]:
         agent = agents[meal_type]
         response = agent.generate_suggestions(user_data, agents["budget"])        
+        if response.get("circuit_open"):
+            # LLM backend is failing fast; serve local recipes instead
+            response = fallback_meal(
+                meal_type,
+                user_data["dietary"],
+                agents["budget"].remaining_budget / 4,
+                meal_calorie_limit(user_data)
+            ) or response
         if "error" in response:
             meal_plan[meal_type] = response  # Store error but continue
             continue
@@ -118,5 +513,7 @@ def run_meal_planning(agents: dict, user_data: dict) -> dict:
     meal_plan["remaining_budget"] = remaining_budget
     return meal_plan
 
+job_manager = create_job_manager()
+
 if __name__ == '__main__':
     app.run(debug=True, host='127.0.0.1', port=5000)
\ No newline at end of file
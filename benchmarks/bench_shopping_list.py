@@ -0,0 +1,175 @@
+"""Microbenchmarks for the shopping-list pipeline.
+
+Run from the project root:
+
+    python -m benchmarks.bench_shopping_list --save-baseline   # record a baseline
+    python -m benchmarks.bench_shopping_list                   # compare against it
+
+Exits with status 1 when any stage is slower or uses more peak memory than
+the baseline allows (see --tolerance), and 2 when there is no baseline.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from agents.shopping_list_agent import ShoppingListAgent
+
+DAYS = (1, 7, 30, 365)
+# Size of the ingredient name pool each synthetic plan samples from
+DISTINCT_INGREDIENTS = (10, 100, 1000, 10000)
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snacks")
+OPTIONS_PER_MEAL = 3
+INGREDIENTS_PER_OPTION = 6
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Mix of store-category keywords and unmatched words so categorization walks every branch
+NAME_WORDS = ["milk", "cheese", "chicken", "beef", "bread", "spices", "oils", "frozen fruits",
+              "herbs", "quinoa", "lentils", "tofu", "almond", "squash", "vinegar"]
+
+
+def ingredient_pool(size: int) -> list:
+    return [f"{NAME_WORDS[i % len(NAME_WORDS)]} {i}" for i in range(size)]
+
+
+def synthetic_meal_plan(days: int, distinct: int, seed: int = 0) -> dict:
+    """A multi-day plan shaped like run_meal_planning output, keyed per day and meal."""
+    rng = random.Random(seed)
+    pool = ingredient_pool(distinct)
+    plan = {}
+    for day in range(days):
+        for meal_type in MEAL_TYPES:
+            plan[f"day{day}_{meal_type}"] = {
+                "options": [
+                    {
+                        "name": f"{meal_type} {day}-{option}",
+                        "ingredients": rng.sample(pool, min(INGREDIENTS_PER_OPTION, distinct))
+                    }
+                    for option in range(OPTIONS_PER_MEAL)
+                ]
+            }
+    plan["remaining_budget"] = 0.0
+    return plan
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """Best wall time over `repeat` runs plus peak traced memory of one run.
+
+    `setup` builds fresh arguments for each run outside the timed section,
+    for stages that mutate their inputs.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    args = setup() if setup else ()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": min(timings), "peak_bytes": peak}
+
+
+def plan_ingredient_names(plan: dict) -> list:
+    return [
+        name
+        for meal in plan.values() if isinstance(meal, dict)
+        for option in meal["options"]
+        for name in option["ingredients"]
+    ]
+
+
+def run_case(agent: ShoppingListAgent, plan: dict, pool: int, repeat: int) -> dict:
+    names = ingredient_pool(pool)
+    ingredient_names = plan_ingredient_names(plan)
+
+    def parsed_ingredients():
+        # _consolidate_ingredients adds into the objects it gets, so each run needs fresh ones
+        return ([
+            agent._parse_ingredient({"name": name, "quantity": 1.0, "unit": "piece"})
+            for name in ingredient_names
+        ],)
+
+    return {
+        "process_meal_plans": measure(lambda: agent.process_meal_plans(plan), repeat),
+        "categorize_ingredient": measure(lambda: [agent._categorize_ingredient(n) for n in names], repeat),
+        "consolidate_ingredients": measure(agent._consolidate_ingredients, repeat, setup=parsed_ingredients),
+        "generate_shopping_list": measure(lambda: agent.generate_shopping_list(plan), repeat),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_seconds: float) -> list:
+    """Regression messages for stages that exceed the baseline by more than tolerance.
+
+    Slowdowns smaller than min_seconds are ignored so timer noise on
+    microsecond-scale stages doesn't fail the run.
+    """
+    regressions = []
+    for case, stages in results.items():
+        for stage, metrics in stages.items():
+            base = baseline.get(case, {}).get(stage)
+            if not base:
+                continue
+            for metric in ("seconds", "peak_bytes"):
+                if metric == "seconds" and metrics[metric] - base[metric] < min_seconds:
+                    continue
+                if base[metric] and metrics[metric] > base[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{case} {stage} {metric}: {metrics[metric]:.6g} vs baseline {base[metric]:.6g} "
+                        f"(+{(metrics[metric] / base[metric] - 1) * 100:.0f}%)"
+                    )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth, 0.25 = 25%%")
+    parser.add_argument("--min-seconds", type=float, default=0.001, help="ignore slowdowns below this many seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="only the 1- and 7-day plans")
+    args = parser.parse_args()
+
+    agent = ShoppingListAgent()
+    days_list = DAYS[:2] if args.quick else DAYS
+    results = {}
+    print(f"{'case':<36}{'stage':<26}{'seconds':>12}{'peak KiB':>12}")
+    for days in days_list:
+        for pool in DISTINCT_INGREDIENTS:
+            plan = synthetic_meal_plan(days, pool)
+            # Small plans use only part of a large pool; label the case with what they actually hold
+            distinct = len(set(plan_ingredient_names(plan)))
+            case = f"days={days},pool={pool},distinct={distinct}"
+            results[case] = run_case(agent, plan, pool, args.repeat)
+            for stage, metrics in results[case].items():
+                print(f"{case:<36}{stage:<26}{metrics['seconds']:>12.6f}{metrics['peak_bytes'] / 1024:>12.1f}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.tolerance, args.min_seconds)
+    if regressions:
+        print("\nREGRESSIONS:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,8 @@ load_dotenv()
 class GroqConfig:
     BASE_URL = "https://api.groq.com/openai/v1"
     MODEL_NAME = "llama-3.3-70b-versatile"
+    # Options requested per meal call; values above 3 over-generate and keep the first 3 valid
+    MEAL_CANDIDATES = int(os.getenv("MEAL_CANDIDATES", "3"))
 
     def __init__(self):
         self.api_key = self._validate_env()
@@ -47,8 +49,8 @@ class GroqConfig:
                 "price": [0, 0]
             }],
             "temperature": 0.7,
-            "timeout": 120,
-            "max_retries": 3 
+            "timeout": int(os.getenv("LLM_TIMEOUT", 120)),
+            "max_retries": int(os.getenv("LLM_MAX_RETRIES", 3))
         }
 
 groq_config = GroqConfig()
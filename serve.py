@@ -0,0 +1,72 @@
+"""Production launcher: N gunicorn worker processes sharing key, cache and plan state.
+
+Usage: python serve.py [--workers N] [--threads N] [--bind HOST:PORT]
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def stable_secret_key(state_dir: str) -> str:
+    """SECRET_KEY from the environment, else one persisted in the state directory."""
+    if os.getenv("SECRET_KEY"):
+        return os.environ["SECRET_KEY"]
+    key_path = os.path.join(state_dir, "secret_key")
+    if not os.path.exists(key_path):
+        fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(key_path) as f:
+        return f.read().strip()
+
+
+def configure_shared_state(state_dir: str) -> None:
+    """Point every worker at the same key and SQLite-backed stores before forking."""
+    os.makedirs(state_dir, exist_ok=True)
+    os.environ["STATE_DIR"] = state_dir
+    os.environ["SECRET_KEY"] = stable_secret_key(state_dir)
+    os.environ.setdefault("PLAN_STORE", "sqlite")
+    os.environ.setdefault("PLAN_CACHE_STORE", "sqlite")
+    os.environ.setdefault("JOB_BACKEND", "sqlite")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the meal planner with multiple worker processes")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", multiprocessing.cpu_count())))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WEB_THREADS", 4)))
+    parser.add_argument("--bind", default=os.getenv("BIND", "0.0.0.0:8000"))
+    parser.add_argument("--state-dir", default=os.getenv("STATE_DIR", "instance"))
+    args = parser.parse_args()
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("serve.py needs gunicorn: pip install gunicorn")
+
+    configure_shared_state(args.state_dir)
+
+    class MealPlannerApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", args.bind)
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("threads", args.threads)
+            self.cfg.set("worker_class", "gthread")
+            # Plan generation can outlive the default 30s worker timeout
+            self.cfg.set("timeout", int(os.getenv("WEB_TIMEOUT", 180)))
+            # Each worker imports the app itself so its job pool threads exist after fork
+            self.cfg.set("preload_app", False)
+
+        def load(self):
+            from app import app
+            return app
+
+    MealPlannerApplication().run()
+
+
+if __name__ == "__main__":
+    main()
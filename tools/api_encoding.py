@@ -0,0 +1,113 @@
+import gzip
+from dataclasses import asdict
+
+from agents.shopping_list_agent import Ingredient
+
+try:
+    import brotli
+except ImportError:  # Optional: only used when clients accept "br"
+    brotli = None
+
+MIN_COMPRESS_BYTES = 512
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snacks")
+
+
+def shopping_list_to_dict(shopping_list: dict) -> dict:
+    """Convert a shopping list with Ingredient records into plain JSON data."""
+    return {
+        **shopping_list,
+        "categorized_list": {
+            category: [asdict(item) if not isinstance(item, dict) else item for item in items]
+            for category, items in shopping_list["categorized_list"].items()
+        }
+    }
+
+
+def shopping_list_from_dict(data: dict) -> dict:
+    """Rebuild Ingredient records from a stored shopping list."""
+    return {
+        **data,
+        "categorized_list": {
+            category: [Ingredient(**item) for item in items]
+            for category, items in data["categorized_list"].items()
+        }
+    }
+
+
+def ingredient_ids(meal_plan: dict) -> dict:
+    """Assign IDs to a plan's ingredients in order of first appearance."""
+    ids = {}
+    for meal_type in MEAL_TYPES:
+        for option in meal_plan.get(meal_type, {}).get("options", []):
+            for ingredient in option.get("ingredients", []):
+                ids.setdefault(ingredient.lower(), len(ids))
+    return ids
+
+
+def ingredient_table(ids: dict) -> list:
+    """Ingredient names indexed by ID."""
+    return sorted(ids, key=ids.get)
+
+
+def compact_meal_plan(meal_plan: dict) -> dict:
+    """Drop descriptions and replace ingredient names with IDs."""
+    ids = ingredient_ids(meal_plan)
+    meals = {}
+    for meal_type, meal_data in meal_plan.items():
+        if meal_type not in MEAL_TYPES or "options" not in meal_data:
+            meals[meal_type] = meal_data
+            continue
+        meals[meal_type] = {
+            **{key: value for key, value in meal_data.items() if key != "options"},
+            "options": [
+                {
+                    **{key: value for key, value in option.items() if key not in ("description", "ingredients")},
+                    "ingredients": [ids[ingredient.lower()] for ingredient in option.get("ingredients", [])]
+                }
+                for option in meal_data["options"]
+            ]
+        }
+    return {**meals, "ingredients": ingredient_table(ids)}
+
+
+def compact_shopping_list(shopping_list: dict, meal_plan: dict) -> dict:
+    """Shopping list items as [ingredient_id, quantity, unit, estimated_price] rows."""
+    ids = ingredient_ids(meal_plan)
+    shopping_list = shopping_list_to_dict(shopping_list)
+    categorized = {}
+    for category, items in shopping_list["categorized_list"].items():
+        rows = []
+        for item in items:
+            item_id = ids.setdefault(item["name"].lower(), len(ids))
+            rows.append([item_id, item["quantity"], item["unit"], round(item["estimated_price"], 2)])
+        categorized[category] = rows
+    return {
+        "categorized_list": categorized,
+        "total_items": shopping_list["total_items"],
+        "total_estimated_cost": round(shopping_list["total_estimated_cost"], 2),
+        "ingredients": ingredient_table(ids)
+    }
+
+
+def compress_body(body: bytes, accept_encoding: str) -> tuple:
+    """Compress a response body with the best encoding the client accepts."""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            accepted.add(coding.lower())
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
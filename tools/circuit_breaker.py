@@ -0,0 +1,125 @@
+import os
+import time
+from collections import deque
+from threading import Lock
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the backend while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Trips on a high error or slow-call rate over a sliding window of calls.
+
+    While open, calls fail immediately. After `reset_timeout` seconds a single
+    half-open probe is let through; success closes the circuit, failure
+    re-opens it.
+    """
+
+    def __init__(self, name: str, window_size: int = 20, min_calls: int = 5,
+                 failure_rate: float = 0.5, slow_call_seconds: float = 30.0,
+                 reset_timeout: float = 30.0):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self._outcomes = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = Lock()
+        self.total_calls = 0
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.last_latency = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def _refresh_state(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+
+    def _before_call(self) -> bool:
+        """Admit or reject a call; returns True if it is the half-open probe."""
+        with self._lock:
+            self._refresh_state()
+            if self._state == OPEN or (self._state == HALF_OPEN and self._probe_in_flight):
+                self.total_rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open; failing fast")
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def _record(self, ok: bool, latency: float, probe: bool) -> None:
+        with self._lock:
+            self.total_calls += 1
+            self.last_latency = latency
+            if not ok:
+                self.total_failures += 1
+            if probe:
+                self._probe_in_flight = False
+                if ok:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(ok)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._trip()
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def call(self, func, *args, **kwargs):
+        """Run func through the breaker; slow calls count as failures."""
+        probe = self._before_call()
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self._record(False, time.monotonic() - start, probe)
+            raise
+        latency = time.monotonic() - start
+        self._record(latency <= self.slow_call_seconds, latency, probe)
+        return result
+
+    def metrics(self) -> dict:
+        with self._lock:
+            self._refresh_state()
+            window = len(self._outcomes)
+            return {
+                "state": self._state,
+                "state_value": STATE_VALUES[self._state],
+                "window_error_rate": self._outcomes.count(False) / window if window else 0.0,
+                "total_calls": self.total_calls,
+                "total_failures": self.total_failures,
+                "total_rejected": self.total_rejected,
+                "last_latency_seconds": self.last_latency
+            }
+
+
+# Shared by every agent that calls the Groq backend
+llm_circuit_breaker = CircuitBreaker(
+    "llm",
+    window_size=int(os.getenv("LLM_BREAKER_WINDOW", 20)),
+    min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", 5)),
+    failure_rate=float(os.getenv("LLM_BREAKER_FAILURE_RATE", 0.5)),
+    slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", 30)),
+    reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30))
+)
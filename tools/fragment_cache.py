@@ -0,0 +1,44 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from threading import Lock
+
+
+def content_hash(data) -> str:
+    """Stable hash of JSON-like data (dataclasses are hashed by their fields)."""
+    payload = json.dumps(
+        data,
+        sort_keys=True,
+        default=lambda obj: asdict(obj) if is_dataclass(obj) else str(obj)
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class FragmentCache:
+    """Bounded LRU cache of rendered HTML fragments."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render, *args, **kwargs):
+        """Return the cached fragment for key, rendering and storing it on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        fragment = render(*args, **kwargs)
+
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
@@ -0,0 +1,218 @@
+import json
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity."""
+
+
+class InMemoryJobBackend:
+    """Job records held in a dict; lost when the process exits.
+
+    Only the `max_finished` most recently finished jobs are kept.
+    """
+
+    def __init__(self, max_finished: int = 1000):
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._finished = OrderedDict()
+        self._lock = Lock()
+
+    def add(self, job: dict) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def get(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running; False if another worker got it first."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job["status"] != QUEUED:
+                return False
+            job.update(status=RUNNING, updated_at=time.time())
+            return True
+
+    def finish(self, job_id: str, status: str, result=None, error=None) -> None:
+        with self._lock:
+            self._jobs[job_id].update(status=status, result=result, error=error, updated_at=time.time())
+            self._finished[job_id] = None
+            while len(self._finished) > self.max_finished:
+                evicted, _ = self._finished.popitem(last=False)
+                del self._jobs[evicted]
+
+    def queued_ids(self) -> list:
+        with self._lock:
+            return [job_id for job_id, job in self._jobs.items() if job["status"] == QUEUED]
+
+    def fail_stale(self, older_than: float, error: str) -> int:
+        """Fail running jobs not updated since `older_than`; returns how many."""
+        with self._lock:
+            stale = [job_id for job_id, job in self._jobs.items()
+                     if job["status"] == RUNNING and job["updated_at"] < older_than]
+        for job_id in stale:
+            self.finish(job_id, FAILED, error=error)
+        return len(stale)
+
+
+class SQLiteJobBackend:
+    """Job records in a SQLite file, shared by every process that opens it."""
+
+    def __init__(self, path: str, max_finished: int = 1000):
+        self.path = path
+        self.max_finished = max_finished
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def add(self, job: dict) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, payload, result, error, created_at, updated_at) "
+                "VALUES (?, ?, ?, NULL, NULL, ?, ?)",
+                (job["id"], job["status"], json.dumps(job["payload"]), job["created_at"], job["updated_at"])
+            )
+
+    def get(self, job_id: str):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def claim(self, job_id: str) -> bool:
+        """Move a queued job to running; False if another worker got it first."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), job_id, QUEUED)
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: str, status: str, result=None, error=None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND id NOT IN "
+                "(SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY updated_at DESC LIMIT ?)",
+                (*FINISHED_STATUSES, *FINISHED_STATUSES, self.max_finished)
+            )
+
+    def queued_ids(self) -> list:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status = ? ORDER BY created_at", (QUEUED,)).fetchall()
+        return [row["id"] for row in rows]
+
+    def fail_stale(self, older_than: float, error: str) -> int:
+        """Fail running jobs not updated since `older_than`; returns how many."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (FAILED, error, time.time(), RUNNING, older_than)
+            )
+            return cursor.rowcount
+
+
+class JobManager:
+    """Runs jobs on a bounded local worker pool and records their status."""
+
+    def __init__(self, backend, handler, max_workers: int = 4, max_pending: int = 32,
+                 stale_after: float = 1800):
+        self.backend = backend
+        self.handler = handler
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-job")
+        self._pending = 0
+        self._lock = Lock()
+        # Running jobs a crashed or restarted worker never finished; fail them so pollers stop waiting
+        backend.fail_stale(time.time() - stale_after, "Job was interrupted; please resubmit")
+        # Pick up jobs left queued by a previous run; claim() stops double execution
+        for job_id in backend.queued_ids():
+            self._pending += 1
+            self._executor.submit(self._run, job_id)
+
+    def submit(self, payload: dict) -> str:
+        """Queue a job and return its ID, or raise QueueFullError."""
+        now = time.time()
+        job = {"id": uuid.uuid4().hex, "status": QUEUED, "payload": payload, "created_at": now, "updated_at": now}
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+            self._pending += 1
+        try:
+            self.backend.add(job)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._executor.submit(self._run, job["id"])
+        return job["id"]
+
+    def _run(self, job_id: str) -> None:
+        try:
+            if not self.backend.claim(job_id):
+                return
+            job = self.backend.get(job_id)
+            try:
+                result = self.handler(job["payload"])
+            except Exception as e:
+                print(f"Error in job {job_id}: {str(e)}")  # Debug print
+                self.backend.finish(job_id, FAILED, error=str(e))
+            else:
+                self.backend.finish(job_id, SUCCEEDED, result=result)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id: str):
+        return self.backend.get(job_id)
+
+    def wait(self, job_id: str, timeout: float, last_status: str = None, poll_interval: float = 0.25):
+        """Poll until the job finishes (or leaves last_status) or the timeout passes."""
+        deadline = time.monotonic() + timeout
+        job = self.backend.get(job_id)
+        while (job and job["status"] not in FINISHED_STATUSES
+               and (last_status is None or job["status"] == last_status)
+               and time.monotonic() < deadline):
+            time.sleep(poll_interval)
+            job = self.backend.get(job_id)
+        return job
+
+    @property
+    def pending(self) -> int:
+        return self._pending
@@ -0,0 +1,48 @@
+from tools.price_table import estimate_meal_cost
+
+MEAL_TYPES_PER_DAY = 4
+
+
+def meal_calorie_limit(user_input: dict) -> float:
+    """One meal type's share of the daily calorie goal (the form's `calories` field)."""
+    return float(user_input.get("calories", 2000)) / MEAL_TYPES_PER_DAY
+
+
+def has_forbidden_ingredients(option: dict, forbidden: list) -> bool:
+    """Check a meal option's ingredients against a dietary blocklist."""
+    ingredients = ' '.join(option['ingredients']).lower()
+    return any(ing in ingredients for ing in forbidden)
+
+
+def select_options(candidates: list, forbidden: list, max_budget: float,
+                   max_calories: float, count: int = 3) -> list:
+    """Pick the first `count` candidates that pass the diet, cost and calorie checks."""
+    selected = []
+    total_cost = 0.0
+    total_cals = 0
+    for option in candidates:
+        if has_forbidden_ingredients(option, forbidden):
+            continue
+        if total_cost + option["cost"] > max_budget or total_cals + option["calories"] > max_calories:
+            continue
+        selected.append(option)
+        total_cost += option["cost"]
+        total_cals += option["calories"]
+        if len(selected) == count:
+            break
+    return selected
+
+
+def apply_price_estimates(options: list) -> list:
+    """Replace LLM-claimed costs with price-table estimates.
+
+    Fully priced options get the table cost; partially priced ones keep the
+    higher of the two so unknown ingredients never make a meal look cheaper.
+    """
+    for option in options:
+        estimate, unpriced = estimate_meal_cost(option.get("ingredients", []))
+        if unpriced == 0 and option.get("ingredients"):
+            option["cost"] = round(estimate, 2)
+        else:
+            option["cost"] = round(max(float(option.get("cost", 0)), estimate), 2)
+    return options
@@ -0,0 +1,179 @@
+import copy
+import json
+import math
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+MEAL_TYPES = ("breakfast", "lunch", "dinner", "snacks")
+
+# Width of each budget ($) and calorie band, per diet; "default" covers the rest
+DEFAULT_BANDS = {
+    "default": {"budget": 5.0, "calories": 250},
+    "vegan": {"budget": 4.0, "calories": 200},
+    "gluten-free": {"budget": 6.0, "calories": 250},
+}
+
+
+def merge_bands(overrides: dict = None) -> dict:
+    """Combine per-diet band overrides with DEFAULT_BANDS, filling gaps from "default"."""
+    overrides = overrides or {}
+    default = {**DEFAULT_BANDS["default"], **overrides.get("default", {})}
+    bands = {}
+    for dietary in {*DEFAULT_BANDS, *overrides}:
+        if dietary == "default":
+            band = default
+        else:
+            band = {**default, **DEFAULT_BANDS.get(dietary, {}), **overrides.get(dietary, {})}
+        for field in ("budget", "calories"):
+            if not isinstance(band[field], (int, float)) or band[field] <= 0:
+                raise ValueError(f"Plan cache band {dietary}.{field} must be a positive number")
+        bands[dietary] = band
+    return bands
+
+
+def plan_totals(meal_plan: dict):
+    """Total (cost, calories) of a complete LLM plan, or None if any meal failed or fell back."""
+    total_cost = 0.0
+    total_calories = 0
+    for meal_type in MEAL_TYPES:
+        meal = meal_plan.get(meal_type)
+        if not meal or "error" in meal or meal.get("fallback"):
+            return None
+        total_cost += meal.get("total_cost", 0)
+        total_calories += meal.get("total_calories", 0)
+    return total_cost, total_calories
+
+
+class ProfilePlanCache:
+    """Reuses plans across users whose diet, budget and calorie goal fall in the same band."""
+
+    def __init__(self, bands: dict = None, max_buckets: int = 1000, plans_per_bucket: int = 4):
+        self.bands = merge_bands(bands)
+        self.max_buckets = max_buckets
+        self.plans_per_bucket = plans_per_bucket
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def bucket_key(self, user_data: dict) -> tuple:
+        dietary = (user_data.get("dietary") or "none").lower()
+        band = self.bands.get(dietary, self.bands["default"])
+        return (
+            dietary,
+            math.floor(user_data["budget"] / band["budget"]),
+            math.floor(user_data["calories"] / band["calories"])
+        )
+
+    def lookup(self, user_data: dict, budget_agent):
+        """Return a cached plan that fits this user, re-validated through budget_agent."""
+        dietary, budget_band, calorie_band = self.bucket_key(user_data)
+        # Own band first, then neighbours, so users just across a band edge still match
+        keys = [(dietary, budget_band + db, calorie_band + dc)
+                for db in (0, -1, 1) for dc in (0, -1, 1)]
+        candidates = self._candidates(keys)
+        for total_cost, total_calories, meal_plan in candidates:
+            if total_cost > user_data["budget"] or total_calories > user_data["calories"]:
+                continue
+            checks = [
+                budget_agent.validate_meal_cost(meal_plan[meal_type].get("total_cost", 0))
+                for meal_type in MEAL_TYPES
+            ]
+            if all(check["status"] == "approved" for check in checks):
+                with self._lock:
+                    self.hits += 1
+                plan = copy.deepcopy(meal_plan)
+                plan["remaining_budget"] = budget_agent.remaining_budget
+                return plan
+            # A partially approved plan already spent budget; restore it for the next candidate
+            budget_agent.remaining_budget = user_data["budget"]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, user_data: dict, meal_plan: dict) -> None:
+        """Cache a complete plan under the user's profile band."""
+        totals = plan_totals(meal_plan)
+        if totals is None:
+            return
+        self._add(self.bucket_key(user_data), (*totals, copy.deepcopy(meal_plan)))
+
+    def _candidates(self, keys: list) -> list:
+        """(total_cost, total_calories, meal_plan) entries for the given buckets, in key order."""
+        candidates = []
+        with self._lock:
+            for key in keys:
+                if key in self._buckets:
+                    candidates.extend(self._buckets[key])
+                    self._buckets.move_to_end(key)
+        return candidates
+
+    def _add(self, key: tuple, entry: tuple) -> None:
+        with self._lock:
+            plans = self._buckets.setdefault(key, [])
+            plans.append(entry)
+            del plans[:-self.plans_per_bucket]
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+
+
+class SQLiteProfilePlanCache(ProfilePlanCache):
+    """Profile plan cache kept in a SQLite file so every worker process shares it."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plan_cache (
+                    bucket TEXT NOT NULL,
+                    total_cost REAL NOT NULL,
+                    total_calories REAL NOT NULL,
+                    plan TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS plan_cache_bucket ON plan_cache (bucket, created_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _bucket_id(key: tuple) -> str:
+        return "|".join(str(part) for part in key)
+
+    def _candidates(self, keys: list) -> list:
+        bucket_ids = [self._bucket_id(key) for key in keys]
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT bucket, total_cost, total_calories, plan FROM plan_cache "
+                f"WHERE bucket IN ({','.join('?' * len(bucket_ids))}) ORDER BY created_at DESC",
+                bucket_ids
+            ).fetchall()
+        order = {bucket_id: i for i, bucket_id in enumerate(bucket_ids)}
+        rows.sort(key=lambda row: order[row[0]])
+        return [(row[1], row[2], json.loads(row[3])) for row in rows]
+
+    def _add(self, key: tuple, entry: tuple) -> None:
+        bucket_id = self._bucket_id(key)
+        total_cost, total_calories, meal_plan = entry
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO plan_cache (bucket, total_cost, total_calories, plan, created_at) VALUES (?, ?, ?, ?, ?)",
+                (bucket_id, total_cost, total_calories, json.dumps(meal_plan), time.time())
+            )
+            conn.execute(
+                "DELETE FROM plan_cache WHERE bucket = ? AND rowid NOT IN "
+                "(SELECT rowid FROM plan_cache WHERE bucket = ? ORDER BY created_at DESC LIMIT ?)",
+                (bucket_id, bucket_id, self.plans_per_bucket)
+            )
+            conn.execute(
+                "DELETE FROM plan_cache WHERE rowid NOT IN "
+                "(SELECT rowid FROM plan_cache ORDER BY created_at DESC LIMIT ?)",
+                (self.max_buckets * self.plans_per_bucket,)
+            )
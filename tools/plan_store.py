@@ -0,0 +1,94 @@
+import json
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+
+class InMemoryPlanStore:
+    """Bounded in-process store of generated meal plans keyed by plan ID."""
+
+    def __init__(self, max_plans: int = 1000):
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+        self._lock = Lock()
+
+    def save(self, record: dict) -> str:
+        """Store a plan record and return its new ID."""
+        plan_id = uuid.uuid4().hex
+        record = {**record, "id": plan_id, "updated_at": time.time()}
+        with self._lock:
+            self._plans[plan_id] = record
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan_id
+
+    def get(self, plan_id: str):
+        """Return the plan record, or None if it is unknown or evicted."""
+        with self._lock:
+            record = self._plans.get(plan_id)
+            if record is not None:
+                self._plans.move_to_end(plan_id)
+            return record
+
+    def update(self, plan_id: str, record: dict) -> None:
+        """Replace an existing plan record."""
+        with self._lock:
+            self._plans[plan_id] = {**record, "id": plan_id, "updated_at": time.time()}
+            self._plans.move_to_end(plan_id)
+
+
+class SQLitePlanStore:
+    """Plan records in a SQLite file, shared by every worker process on the host."""
+
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, path: str, max_plans: int = 1000):
+        self.path = path
+        self.max_plans = max_plans
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS plans (
+                    id TEXT PRIMARY KEY,
+                    record TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS plans_accessed_at ON plans (accessed_at)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def save(self, record: dict) -> str:
+        """Store a plan record and return its new ID."""
+        plan_id = uuid.uuid4().hex
+        self.update(plan_id, record)
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM plans WHERE id NOT IN (SELECT id FROM plans ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_plans,)
+            )
+        return plan_id
+
+    def get(self, plan_id: str):
+        """Return the plan record, or None if it is unknown or evicted."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT record, accessed_at FROM plans WHERE id = ?", (plan_id,)).fetchone()
+            now = time.time()
+            # Reads count as use, matching the in-memory store's LRU order; recency is
+            # kept to ACCESS_RESOLUTION seconds so most reads take no write lock
+            if row is not None and row[1] < now - self.ACCESS_RESOLUTION:
+                conn.execute("UPDATE plans SET accessed_at = ? WHERE id = ?", (now, plan_id))
+        return json.loads(row[0]) if row else None
+
+    def update(self, plan_id: str, record: dict) -> None:
+        """Insert or replace a plan record."""
+        now = time.time()
+        record = {**record, "id": plan_id, "updated_at": now}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO plans (id, record, accessed_at) VALUES (?, ?, ?)",
+                (plan_id, json.dumps(record), now)
+            )
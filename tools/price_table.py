@@ -0,0 +1,55 @@
+import csv
+import os
+
+PRICE_TABLE_PATH = os.getenv(
+    "PRICE_TABLE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "ingredient_prices.csv")
+)
+MAX_NAME_WORDS = 3
+
+
+def load_price_table(path: str = PRICE_TABLE_PATH) -> dict:
+    """Load the per-serving price CSV into a name -> price index."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {
+            row["name"].strip().lower(): float(row["price_per_serving"])
+            for row in csv.DictReader(f)
+        }
+
+
+price_index = load_price_table()
+
+
+def _candidate_names(words: list):
+    """Yield word n-grams, longest first, so 'greek yogurt' beats 'yogurt'."""
+    for size in range(min(MAX_NAME_WORDS, len(words)), 0, -1):
+        for start in range(len(words) - size + 1):
+            yield " ".join(words[start:start + size])
+
+
+def lookup_price(ingredient_name: str) -> float:
+    """Per-serving price for an ingredient, or 0.0 when it isn't in the table."""
+    words = "".join(c if c.isalnum() or c == "-" else " " for c in ingredient_name.lower()).split()
+    for name in _candidate_names(words):
+        if name in price_index:
+            return price_index[name]
+        # Plural forms ('bananas', 'tomatoes')
+        for suffix in ("es", "s"):
+            if name.endswith(suffix) and name[:-len(suffix)] in price_index:
+                return price_index[name[:-len(suffix)]]
+    return 0.0
+
+
+def estimate_meal_cost(ingredients: list) -> tuple:
+    """Sum ingredient prices; returns (cost, number of unpriced ingredients)."""
+    cost = 0.0
+    unpriced = 0
+    for ingredient in ingredients:
+        price = lookup_price(ingredient)
+        if price:
+            cost += price
+        else:
+            unpriced += 1
+    return cost, unpriced
@@ -0,0 +1,116 @@
+import json
+import math
+from threading import Lock
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:  # Optional: exact BPE counts when installed
+    _encoding = None
+
+# Rules that only earn their tokens when a dietary restriction is active
+DIET_RULES = {
+    "vegetarian": [],
+    "vegan": ["Use labeled plant-based ingredients where necessary"],
+    "gluten-free": ["Use labeled gluten-free ingredients where necessary"],
+}
+
+SHARED_RULES = [
+    "Use diverse ingredients and cooking methods",
+    "Include both hot and cold options",
+    "Use diverse protein sources",
+]
+
+_template_cache = {}
+prompt_token_stats = {}
+_stats_lock = Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """BPE token count via tiktoken, else the usual ~4 characters per token estimate."""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def compact_system_message(system_message: str) -> str:
+    """Strip indentation from a system message and minify its JSON schema."""
+    head, _, schema = system_message.partition("Required format:")
+    lines = [line.strip() for line in head.splitlines() if line.strip()]
+    if schema:
+        try:
+            schema = json.dumps(json.loads(schema), separators=(",", ":"))
+        except json.JSONDecodeError:
+            schema = " ".join(schema.split())
+        lines.append("Required format:" + schema)
+    return "\n".join(lines)
+
+
+def _template_key(dietary: str) -> str:
+    """Known diets get their own template; any other restriction shares one."""
+    if dietary in ("", "none"):
+        return "none"
+    return dietary if dietary in DIET_RULES else "restricted"
+
+
+def _build_template(meal_label: str, diet_key: str) -> str:
+    """Build the rule list for one (agent, diet) pair, with numeric placeholders."""
+    rules = []
+    restricted = diet_key != "none"
+    if restricted:
+        # The generic template fills in the user's own diet text at render time
+        label = "{dietary}" if diet_key == "restricted" else diet_key
+        rules.append(f"Strictly follow {label} dietary restrictions")
+    rules += [
+        "Any 3 options have combined cost ≤ ${max_budget:.2f}",
+        "Any 3 options total ≤ {max_calories:.0f}kcal",
+        "No single meal exceeds ${max_option_cost:.2f}",
+    ]
+    rules += SHARED_RULES
+    if restricted:
+        rules += DIET_RULES.get(diet_key, [])
+        rules.append("If constraints conflict, prioritize diet restrictions over cost")
+    rules.append("Respond only with JSON in the required format")
+    header = "Create exactly {count} " + meal_label + " options that:"
+    return "\n".join([header] + [f"- {rule}" for rule in rules])
+
+
+def build_meal_prompt(agent, meal_label: str, dietary: str, max_budget: float,
+                      max_calories: float, count: int = 3) -> str:
+    """Render the user prompt for a meal agent and record its token count."""
+    dietary = (dietary or "none").lower()
+    # Bounded: at most len(DIET_RULES) + 2 templates per agent
+    key = (agent.name, _template_key(dietary))
+    cached = _template_cache.get(key)
+    if cached is None:
+        # The system message (with the schema) is sent alongside every request
+        cached = _template_cache[key] = (
+            _build_template(meal_label, key[1]),
+            estimate_tokens(agent.system_message)
+        )
+    template, system_tokens = cached
+
+    prompt = template.format(
+        count=count,
+        dietary=dietary,
+        max_budget=max_budget,
+        max_calories=max_calories,
+        max_option_cost=max_budget / 3,
+    )
+
+    prompt_tokens = system_tokens + estimate_tokens(prompt)
+    with _stats_lock:
+        stats = prompt_token_stats.setdefault(agent.name, {"calls": 0, "prompt_tokens": 0})
+        stats["calls"] += 1
+        stats["last_prompt_tokens"] = prompt_tokens
+        stats["prompt_tokens"] += prompt_tokens
+    return prompt
+
+
+def get_prompt_token_stats() -> dict:
+    """Per-agent prompt token counts with the average per call."""
+    with _stats_lock:
+        return {
+            name: {**stats, "avg_prompt_tokens": stats["prompt_tokens"] / stats["calls"]}
+            for name, stats in prompt_token_stats.items()
+        }
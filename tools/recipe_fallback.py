@@ -0,0 +1,46 @@
+import json
+import os
+
+from tools.meal_validator import apply_price_estimates, select_options
+
+FALLBACK_RECIPES_PATH = os.getenv(
+    "FALLBACK_RECIPES_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fallback_recipes.json")
+)
+
+
+def load_recipes(path: str = FALLBACK_RECIPES_PATH) -> dict:
+    """Load local recipes and price them from the ingredient price table."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        recipes = json.load(f)
+    for options in recipes.values():
+        apply_price_estimates(options)
+    return recipes
+
+
+recipes = load_recipes()
+
+
+def fallback_meal(meal_type: str, dietary: str, max_budget: float, max_calories: float):
+    """Three local recipes that fit the diet and limits, shaped like an agent response.
+
+    The options' combined cost must fit the meal budget; each recipe must
+    fit the calorie limit on its own.
+    """
+    dietary = (dietary or "none").lower()
+    candidates = [
+        {key: value for key, value in recipe.items() if key != "diets"}
+        for recipe in recipes.get(meal_type, [])
+        if (dietary == "none" or dietary in recipe["diets"]) and recipe["calories"] <= max_calories
+    ]
+    options = select_options(candidates, [], max_budget, float("inf"))
+    if len(options) < 3:
+        return None
+    return {
+        "options": options,
+        "total_cost": round(sum(option["cost"] for option in options), 2),
+        "total_calories": sum(option["calories"] for option in options),
+        "fallback": True
+    }